@@ -1,27 +1,84 @@
 import argparse
+import asyncio
+import csv
 import sys
 import logging
-from typing import List, Dict, Optional, Tuple
-import pandas as pd
+import os
+import re
+import shelve
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from itertools import chain
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, TextIO, Tuple
+import httpx
 from Bio import Entrez
+from lxml import etree
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO; keep the console to our own progress messages
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # --- Configuration ---
 # Provide your email address to NCBI Entrez
 Entrez.email = "vraykar232@gmail.com" # Replace with a valid email
 
+ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+# NCBI allows 3 requests/second without an API key (10 with one)
+REQUESTS_PER_SECOND = 3
+REQUESTS_PER_SECOND_WITH_API_KEY = 10
+# How long to hold back new requests when NCBI reports the rate limit is (nearly) used up
+RATE_LIMIT_PAUSE = 1.0
+# Upper bound on efetch requests in flight at once
+MAX_CONCURRENT_REQUESTS = 3
+# Concurrent requests are multiplexed as HTTP/2 streams over a single connection
+MAX_CONNECTIONS = 1
+REQUEST_TIMEOUT = 30
+# Transient HTTP statuses worth retrying, with exponential backoff between attempts
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+# Papers are fetched in batches of this many records per efetch request
+BATCH_SIZE = 100
+# Search results are cached on disk so repeated runs of a query skip the download
+CACHE_FILE = ".entrez_cache"
+CACHE_TTL = 24 * 60 * 60 # seconds
+
 # Keywords to identify pharmaceutical/biotech companies (expand as needed)
 COMPANY_KEYWORDS = [
-    "inc", "ltd", "llc", "corp", "corporation", "pharma", "pharmaceuticals",
+    "inc", "ltd", "llc", "corp", "corporation", "pharma", "pharmaceutical", "pharmaceuticals",
     "biotech", "therapeutics", "diagnostics", "biosciences", "gmbh", "ag",
     "bv", "s.a.", "s.l.", "s.r.l."
 ]
 # Domains often associated with academic institutions (expand as needed)
 ACADEMIC_DOMAINS = [".edu", ".ac.", ".org"] # .org can be tricky, use with caution
 
+# Columns of the output CSV, in the order of the row tuples built by _process_paper
+OUTPUT_FIELDS = [
+    "PubMedID", "Title", "Publication Date", "Non-academic Author(s)",
+    "Company Affiliation(s)", "Corresponding Author Email",
+]
+
+# Keywords only count as whole words ("inc" must not match "Princeton" or "incorporated").
+# Tokens may contain inner dots ("s.a.") but never end in one, so keywords drop their trailing dot.
+_TOKEN_RE = re.compile(r"[a-z]+(?:\.[a-z]+)*")
+_COMPANY_TOKENS = frozenset(keyword.rstrip(".") for keyword in COMPANY_KEYWORDS)
+_ACADEMIC_RE = re.compile(r"(?i)" + "|".join(map(re.escape, ACADEMIC_DOMAINS)))
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w.-]+\.[A-Za-z]{2,}")
+# PubDate months are usually abbreviated names; map them to ISO month numbers
+_MONTHS = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05", "Jun": "06",
+    "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+}
+
+def _mentions_company(text: str) -> bool:
+    """Returns True if any word in text is one of the company keywords."""
+    return not _COMPANY_TOKENS.isdisjoint(_TOKEN_RE.findall(text.lower()))
+
 def setup_arg_parser() -> argparse.ArgumentParser:
     """Sets up the command-line argument parser."""
     parser = argparse.ArgumentParser(
@@ -42,76 +99,292 @@ def setup_arg_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Enable debug logging information during execution."
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Always download paper details instead of reusing responses cached in {CACHE_FILE} for up to a day."
+    )
     # Consider adding a limit for the number of results to fetch
     # parser.add_argument("-l", "--limit", type=int, default=100, help="Maximum number of papers to fetch.")
     return parser
 
-def search_pubmed(query: str, retmax: int = 1000) -> List[str]:
-    """Searches PubMed and returns a list of PubMed IDs (PMIDs)."""
+def _eutils_params(**params) -> Dict[str, str]:
+    """Adds the identification parameters NCBI expects on every E-utilities request."""
+    params["tool"] = Entrez.tool
+    params["email"] = Entrez.email
+    if Entrez.api_key:
+        params["api_key"] = Entrez.api_key
+    return params
+
+class _RateLimiter:
+    """
+    Spaces requests evenly at `rate` per second, and holds back new requests when
+    NCBI's X-RateLimit-Remaining header runs low or a request is rejected with HTTP 429.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def acquire(self, request: httpx.Request) -> None:
+        """Waits for the next free request slot (httpx request hook)."""
+        loop = asyncio.get_running_loop()
+        # Re-check after every sleep, since a pause may have pushed the schedule back meanwhile
+        while self.next_slot > loop.time():
+            await asyncio.sleep(self.next_slot - loop.time())
+        self.next_slot = loop.time() + self.interval
+
+    async def observe(self, response: httpx.Response) -> None:
+        """Backs off according to the rate-limit state NCBI reports (httpx response hook)."""
+        if response.status_code == 429:
+            try:
+                pause = float(response.headers.get("Retry-After", RATE_LIMIT_PAUSE))
+            except ValueError:
+                pause = RATE_LIMIT_PAUSE
+            self.pause(pause)
+            return
+        remaining = response.headers.get("X-RateLimit-Remaining", "")
+        if remaining.isdigit() and int(remaining) <= 1:
+            self.pause(RATE_LIMIT_PAUSE)
+
+    def pause(self, seconds: float) -> None:
+        """Delays every request not yet scheduled by at least `seconds`."""
+        logger.debug(f"Rate limit reached, pausing requests for {seconds}s")
+        self.next_slot = max(self.next_slot, asyncio.get_running_loop().time() + seconds)
+
+class _ResponseCache:
+    """
+    Disk cache of a query's search result: its paper count and every fetched efetch page.
+    A query's pages are stored and served as one snapshot, so a run never mixes pages fetched
+    against different versions of the search results. Snapshots expire after CACHE_TTL seconds.
+    Reads and writes run on a worker thread so disk I/O and pickling don't stall in-flight requests.
+    The cache is only an optimization: read and write errors are logged and treated as cache misses.
+    """
+
+    # Shelf entry mapping each cached query to (stored_at, count, number of pages). It is small, so
+    # expiry can be checked without unpickling any page bodies.
+    INDEX_KEY = "\0index"
+
+    def __init__(self, path: str):
+        # shelve is not thread-safe, and its dbm.sqlite3 backend (Python 3.13+) may only be used from
+        # the thread that opened it, so the shelf is opened, used and closed on one worker thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            self.db, self.index = self.executor.submit(self._open, path).result()
+        except BaseException:
+            self.executor.shutdown()
+            raise
+
+    async def get(self, query: str) -> Optional[Tuple[int, List[bytes]]]:
+        """Returns the (count, pages) snapshot cached for query, or None."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._get, query)
+
+    async def put(self, query: str, count: int, pages: List[bytes]) -> None:
+        """Caches a complete (count, pages) snapshot for query, unless a page isn't a valid PubmedArticleSet."""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._put, query, count, pages)
+
+    @staticmethod
+    def _page_key(query: str, page: int) -> str:
+        return f"{query}\0{page}"
+
+    @classmethod
+    def _open(cls, path: str) -> Tuple[shelve.Shelf, Dict[str, Tuple[float, int, int]]]:
+        """
+        Opens the shelf and drops expired snapshots, plus any page no snapshot refers to (e.g. left
+        by an interrupted write), so it doesn't grow without bound. Only the index is unpickled.
+        """
+        db = shelve.open(path)
+        try:
+            try:
+                index = db.get(cls.INDEX_KEY, {})
+            except Exception:
+                index = {}
+            now = time.time()
+            index = {query: entry for query, entry in index.items() if now - entry[0] < CACHE_TTL}
+            live_keys = {
+                cls._page_key(query, page) for query, (_, _, pages) in index.items() for page in range(pages)
+            }
+            live_keys.add(cls.INDEX_KEY)
+            for key in list(db.keys()):
+                if key not in live_keys:
+                    del db[key]
+            db[cls.INDEX_KEY] = index
+        except BaseException:
+            db.close()
+            raise
+        return db, index
+
+    def _get(self, query: str) -> Optional[Tuple[int, List[bytes]]]:
+        entry = self.index.get(query)
+        if entry is None:
+            return None
+        stored_at, count, pages = entry
+        if time.time() - stored_at >= CACHE_TTL:
+            return None
+        try:
+            return count, [self.db[self._page_key(query, page)] for page in range(pages)]
+        except Exception as e:
+            logger.warning(f"Could not read from response cache: {e}")
+            return None
+
+    def _put(self, query: str, count: int, pages: List[bytes]) -> None:
+        for body in pages:
+            # Never replay an efetch error document or a truncated response for a day
+            try:
+                valid = etree.fromstring(body).tag == "PubmedArticleSet"
+            except etree.XMLSyntaxError:
+                valid = False
+            if not valid:
+                logger.debug(f"Not caching results for {query!r}: a fetched batch is not a PubmedArticleSet")
+                return
+        try:
+            # Unlist the old snapshot before overwriting its pages, so an interrupted write can't mix them
+            old = self.index.pop(query, None)
+            self.db[self.INDEX_KEY] = self.index
+            for page, body in enumerate(pages):
+                self.db[self._page_key(query, page)] = body
+            for page in range(len(pages), old[2] if old else 0):
+                del self.db[self._page_key(query, page)]
+            self.index[query] = (time.time(), count, len(pages))
+            self.db[self.INDEX_KEY] = self.index
+        except Exception as e:
+            logger.warning(f"Could not write to response cache: {e}")
+
+    def close(self) -> None:
+        try:
+            self.executor.submit(self.db.close).result()
+        except Exception as e:
+            logger.warning(f"Could not close response cache: {e}")
+        finally:
+            self.executor.shutdown()
+
+def _create_session() -> httpx.AsyncClient:
+    """Creates the rate-limited HTTP/2 client shared by all E-utilities calls."""
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    rate_limiter = _RateLimiter(REQUESTS_PER_SECOND_WITH_API_KEY if Entrez.api_key else REQUESTS_PER_SECOND)
+    return httpx.AsyncClient(
+        http2=True,
+        limits=limits,
+        timeout=REQUEST_TIMEOUT,
+        event_hooks={"request": [rate_limiter.acquire], "response": [rate_limiter.observe]},
+    )
+
+async def _post(session: httpx.AsyncClient, url: str, data: Dict[str, str]) -> bytes:
+    """POSTs to an E-utilities endpoint, retrying transient failures with exponential backoff."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = await session.post(url, data=data)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                response.raise_for_status()
+                return response.content
+            logger.debug(f"{url} returned HTTP {response.status_code}, retrying")
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logger.debug(f"Request to {url} failed ({e!r}), retrying")
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def search_pubmed(session: httpx.AsyncClient, query: str, retmax: int = 1000) -> Tuple[str, str, int]:
+    """
+    Searches PubMed and stores the matching PMIDs on the NCBI history server.
+    Returns (webenv, query_key, count), where count is capped at retmax.
+    """
     logger.info(f"Searching PubMed with query: {query}")
     try:
-        handle = Entrez.esearch(db="pubmed", term=query, retmax=str(retmax))
-        record = Entrez.read(handle)
-        handle.close()
-        pmids = record["IdList"]
-        logger.info(f"Found {len(pmids)} potential papers.")
-        return pmids
+        # usehistory keeps the PMID list server-side; efetch then pages through it
+        data = _eutils_params(db="pubmed", term=query, retmax="0", usehistory="y")
+        record = Entrez.read(BytesIO(await _post(session, ESEARCH_URL, data)))
+        count = min(int(record["Count"]), retmax)
+        logger.info(f"Found {count} potential papers.")
+        return record["WebEnv"], record["QueryKey"], count
     except Exception as e:
         logger.error(f"Error searching PubMed: {e}")
-        return []
+        return "", "", 0
 
-def fetch_paper_details(pmids: List[str]) -> List[Dict]:
-    """Fetches detailed information for a list of PMIDs."""
-    if not pmids:
+async def _fetch_batch(session: httpx.AsyncClient, sem: asyncio.Semaphore, webenv: str, query_key: str,
+                       retstart: int, retmax: int) -> bytes:
+    """POSTs a single efetch request for a page of the search results and returns the raw XML."""
+    data = _eutils_params(db="pubmed", webenv=webenv, query_key=query_key,
+                          retstart=str(retstart), retmax=str(retmax), rettype="xml", retmode="xml")
+    async with sem:
+        return await _post(session, EFETCH_URL, data)
+
+async def fetch_paper_details(session: httpx.AsyncClient, webenv: str, query_key: str, count: int) -> List[bytes]:
+    """
+    Fetches detailed information for the first `count` papers of a stored search.
+    Returns the raw PubMed XML of each successfully fetched batch.
+    """
+    if not count:
         return []
-    logger.info(f"Fetching details for {len(pmids)} papers...")
-    papers_data = []
-    # Fetch in batches to avoid overwhelming the API
-    batch_size = 100
-    for i in range(0, len(pmids), batch_size):
-        batch_pmids = pmids[i:i+batch_size]
+    logger.info(f"Fetching details for {count} papers...")
+    xml_batches = []
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = [
+        _fetch_batch(session, sem, webenv, query_key, i, min(BATCH_SIZE, count - i))
+        for i in range(0, count, BATCH_SIZE)
+    ]
+    # A failed batch comes back as its exception instead of aborting the run
+    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    for batch_number, body in enumerate(responses, start=1):
+        if isinstance(body, Exception):
+            logger.error(f"Error fetching details for batch {batch_number}: {body}")
+            continue
+        xml_batches.append(body)
+        logger.info(f"Fetched details for batch {batch_number}")
+    logger.info(f"Successfully fetched {len(xml_batches)} of {len(tasks)} batches.")
+    return xml_batches
+
+async def collect_papers(query: str, use_cache: bool = True) -> Tuple[int, List[bytes]]:
+    """
+    Runs the search and the detail fetch over a single shared HTTP session.
+    A complete cached result for the query is reused instead; a fresh result is cached only if every batch was fetched.
+    """
+    cache = None
+    if use_cache:
         try:
-            handle = Entrez.efetch(db="pubmed", id=batch_pmids, rettype="medline", retmode="xml")
-            records = Entrez.read(handle)
-            handle.close()
-            # Ensure records['PubmedArticle'] is always a list
-            articles = records.get('PubmedArticle', [])
-            if not isinstance(articles, list):
-                 articles = [articles] # Wrap single article in a list
-
-            for article in articles:
-                 papers_data.append(article)
-            logger.info(f"Fetched details for batch {i//batch_size + 1}")
+            cache = _ResponseCache(CACHE_FILE)
         except Exception as e:
-            logger.error(f"Error fetching details for batch {i//batch_size + 1}: {e}")
-            # Optionally, add partial results or skip the batch
-    logger.info(f"Successfully fetched details for {len(papers_data)} papers.")
-    return papers_data
-
-
+            logger.warning(f"Could not open response cache {CACHE_FILE}, continuing without it: {e}")
+    try:
+        cached = await cache.get(query) if cache is not None else None
+        if cached is not None:
+            count, xml_batches = cached
+            logger.info(f"Using {len(xml_batches)} cached batches for {count} papers (pass --no-cache to refetch).")
+            return count, xml_batches
+        async with _create_session() as session:
+            webenv, query_key, count = await search_pubmed(session, query)
+            xml_batches = await fetch_paper_details(session, webenv, query_key, count)
+        if cache is not None and count and len(xml_batches) == -(-count // BATCH_SIZE):
+            await cache.put(query, count, xml_batches)
+    finally:
+        if cache is not None:
+            cache.close()
+    return count, xml_batches
+
+@lru_cache(maxsize=100_000)
 def is_non_academic(affiliation: str, email: Optional[str]) -> Tuple[bool, Optional[str]]:
     """
     Determines if an affiliation/email suggests a non-academic institution.
     Returns (is_non_academic, company_name_guess).
+    Results are cached, since co-authors and papers from the same lab repeat affiliations verbatim.
     """
-    affiliation_lower = affiliation.lower() if affiliation else ""
-    email_lower = email.lower() if email else ""
+    affiliation = affiliation or ""
+    mentions_company = _mentions_company(affiliation)
 
     # Heuristic 1: Check for company keywords in affiliation
-    for keyword in COMPANY_KEYWORDS:
-        if keyword in affiliation_lower:
-            # Try to extract a potential company name (simple heuristic)
-            parts = affiliation.split(',')
-            company_name = parts[0].strip() # Assume first part is company name
-            return True, company_name
+    if mentions_company:
+        # Try to extract a potential company name (simple heuristic)
+        parts = affiliation.split(',', 1)
+        company_name = parts[0].strip() # Assume first part is company name
+        return True, company_name
 
     # Heuristic 2: Check email domain against academic domains
     if email:
-        is_academic_domain = any(domain in email_lower for domain in ACADEMIC_DOMAINS)
+        is_academic_domain = _ACADEMIC_RE.search(email) is not None
         if not is_academic_domain:
              # If not clearly academic, check if affiliation gives clues
-             if any(keyword in affiliation_lower for keyword in COMPANY_KEYWORDS):
-                 parts = affiliation.split(',')
+             if mentions_company:
+                 parts = affiliation.split(',', 1)
                  company_name = parts[0].strip()
                  return True, company_name
              # If email domain is non-academic but affiliation is unclear,
@@ -124,123 +397,191 @@ def is_non_academic(affiliation: str, email: Optional[str]) -> Tuple[bool, Optio
     return False, None
 
 
-def process_papers(papers_data: List[Dict]) -> List[Dict]:
-    """Processes fetched paper data to extract required fields and identify non-academic authors."""
-    results = []
-    logger.info(f"Processing {len(papers_data)} fetched papers...")
-    for paper in papers_data:
-        try:
-            medline_citation = paper.get('MedlineCitation', {})
-            article = medline_citation.get('Article', {})
-            pubmed_data = paper.get('PubmedData', {})
-            article_id_list = pubmed_data.get('ArticleIdList', {})
-
-            pmid = medline_citation.get('PMID', '')
-            title = article.get('ArticleTitle', '')
-            pub_date_info = article.get('Journal', {}).get('JournalIssue', {}).get('PubDate', {})
-            # Handle different date formats
-            pub_year = pub_date_info.get('Year', '')
-            pub_month = pub_date_info.get('Month', '') # Could be abbreviation or number
-            pub_day = pub_date_info.get('Day', '')
-            publication_date = f"{pub_year}-{pub_month}-{pub_day}".strip('-') # Basic formatting
-
-            authors = article.get('AuthorList', [])
-            if not isinstance(authors, list): # Handle single author case
-                authors = [authors]
-
-            non_academic_authors_list = []
-            company_affiliations_list = []
-            corresponding_author_email = None
-
-            has_non_academic_author = False
-
-            for author in authors:
-                 # Ensure author is a dictionary
-                 if not isinstance(author, dict): continue
-
-                 last_name = author.get('LastName', '')
-                 fore_name = author.get('ForeName', '')
-                 author_name = f"{fore_name} {last_name}".strip()
-
-                 affiliation_info = author.get('AffiliationInfo', [])
-                 if not isinstance(affiliation_info, list): affiliation_info = [affiliation_info] # Handle single affiliation
-
-                 author_affiliation = ""
-                 author_email = None # Check within affiliation info
-
-                 if affiliation_info:
-                     # Concatenate affiliations, look for email within
-                     affiliations_text = []
-                     for affil in affiliation_info:
-                         if isinstance(affil, dict):
-                             affil_text = affil.get('Affiliation', '')
-                             affiliations_text.append(affil_text)
-                             # Simple email check within affiliation text
-                             if '@' in affil_text:
-                                 # Basic extraction, might need refinement
-                                 words = affil_text.split()
-                                 for word in words:
-                                     if '@' in word:
-                                         author_email = word.strip('().,;')
-                                         break
-                     author_affiliation = "; ".join(affiliations_text)
-
-
-                 # Check if this author is non-academic
-                 is_na, company_name = is_non_academic(author_affiliation, author_email)
-
-                 if is_na:
-                     has_non_academic_author = True
-                     non_academic_authors_list.append(author_name)
-                     if company_name and company_name not in company_affiliations_list:
-                         company_affiliations_list.append(company_name)
-
-                 # Check for corresponding author email (often in affiliation)
-                 # This is a basic check; PubMed XML structure can be complex.
-                 # A more robust approach might involve specific XML tags if available.
-                 if author_email and not corresponding_author_email: # Take the first found email as corresponding
-                      corresponding_author_email = author_email
-
-
-            # Only include papers with at least one non-academic author
-            if has_non_academic_author:
-                results.append({
-                    "PubMedID": pmid,
-                    "Title": title,
-                    "Publication Date": publication_date,
-                    "Non-academic Author(s)": "; ".join(non_academic_authors_list),
-                    "Company Affiliation(s)": "; ".join(company_affiliations_list),
-                    "Corresponding Author Email": corresponding_author_email or "N/A",
-                })
+# Stand-in for optional elements that are missing, so their children read as empty text
+_EMPTY_ELEMENT = etree.Element("empty")
 
-        except Exception as e:
-            pmid_for_error = paper.get('MedlineCitation', {}).get('PMID', 'UNKNOWN')
-            logger.warning(f"Could not process paper PMID {pmid_for_error}: {e}")
-            if logger.level == logging.DEBUG:
-                 logger.exception("Detailed processing error:") # Log stack trace in debug mode
+def _element_text(element: Optional[etree._Element]) -> str:
+    """Returns all text inside an element, including text nested in inline markup (e.g. <i>)."""
+    return "".join(element.itertext()) if element is not None else ""
+
+def process_papers(xml_batches: List[bytes]) -> Iterator[Tuple[str, ...]]:
+    """
+    Processes the fetched XML batches in parallel across CPU cores, extracting the required
+    fields and identifying non-academic authors.
+    Yields the output row of each paper meeting the criteria, in the order the batches were fetched.
+    """
+    found = 0
+    logger.info(f"Processing {len(xml_batches)} fetched batches...")
+    if len(xml_batches) > 1:
+        workers = min(os.cpu_count() or 1, len(xml_batches))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch_results in executor.map(_process_xml_bytes, xml_batches):
+                found += len(batch_results)
+                yield from batch_results
+    else:
+        # Not worth starting worker processes for a single batch
+        for xml in xml_batches:
+            batch_results = _process_xml_bytes(xml)
+            found += len(batch_results)
+            yield from batch_results
 
+    logger.info(f"Finished processing. Found {found} papers meeting the criteria.")
 
-    logger.info(f"Finished processing. Found {len(results)} papers meeting the criteria.")
+def _process_xml_bytes(xml: bytes) -> List[Tuple[str, ...]]:
+    """
+    Streams the PubmedArticle records out of one fetched XML batch one article at a time.
+    Returns the output rows of the papers meeting the criteria. Runs in a worker process.
+    """
+    results = []
+    # Affiliation -> is_non_academic result, shared by all papers of the batch
+    classify_cache: Dict[str, Tuple[bool, Optional[str]]] = {}
+    try:
+        for _, paper in etree.iterparse(BytesIO(xml), tag="PubmedArticle"):
+            try:
+                result = _process_paper(paper, classify_cache)
+                if result:
+                    results.append(result)
+            except Exception as e:
+                pmid_for_error = paper.findtext("MedlineCitation/PMID") or 'UNKNOWN'
+                logger.warning(f"Could not process paper PMID {pmid_for_error}: {e}")
+                if logger.level == logging.DEBUG:
+                     logger.exception("Detailed processing error:") # Log stack trace in debug mode
+            finally:
+                # Release the parsed article (and any siblings already seen) to keep memory flat
+                paper.clear()
+                while paper.getprevious() is not None:
+                    del paper.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        logger.error(f"Could not parse fetched batch: {e}")
     return results
 
-def output_results(results: List[Dict], output_file: Optional[str]):
-    """Outputs the results to a CSV file or the console."""
-    if not results:
+def _format_pub_date(date_text: Callable[[str, str], str]) -> str:
+    """
+    Formats a PubDate as an ISO date (YYYY, YYYY-MM or YYYY-MM-DD), given its findtext.
+    Dates without a Year only carry a free-text MedlineDate (e.g. "2023 Jan-Feb"), which is returned as is.
+    """
+    year = date_text("Year", "")
+    if not year:
+        return date_text("MedlineDate", "")
+    month = date_text("Month", "") # Could be abbreviation or number
+    month = month.zfill(2) if month.isdigit() else _MONTHS.get(month[:3].title(), "")
+    if not month:
+        return year
+    day = date_text("Day", "")
+    return f"{year}-{month}-{day.zfill(2)}" if day.isdigit() else f"{year}-{month}"
+
+def _process_paper(paper: etree._Element,
+                   classify_cache: Dict[str, Tuple[bool, Optional[str]]]) -> Optional[Tuple[str, ...]]:
+    """
+    Extracts the output row (in OUTPUT_FIELDS order) for a single PubmedArticle,
+    or None if it has no non-academic authors.
+    classify_cache maps affiliations already seen to their is_non_academic result.
+    """
+    article = paper.find("MedlineCitation/Article")
+    if article is None:
+        return None
+    # Bind hot-loop callables to locals to skip repeated global/attribute lookups
+    element_text = _element_text
+    email_search = _EMAIL_RE.search
+
+    # Read each author's affiliation text once; it is needed both for the scan below and per author
+    authors = [
+        (author, [element_text(affil) for affil in author.iterfind("AffiliationInfo/Affiliation")])
+        for author in article.iterfind("AuthorList/Author")
+    ]
+
+    # Most papers are purely academic. is_non_academic only flags affiliations that mention a
+    # company keyword, so a single scan over all of the paper's affiliations rules those papers
+    # out before any per-author work is done.
+    all_affiliations = "\n".join(chain.from_iterable(texts for _, texts in authors))
+    if not _mentions_company(all_affiliations):
+        return None
+
+    pmid = paper.findtext("MedlineCitation/PMID", "")
+    title = element_text(article.find("ArticleTitle"))
+    pub_date = article.find("Journal/JournalIssue/PubDate")
+    date_text = pub_date.findtext if pub_date is not None else _EMPTY_ELEMENT.findtext
+    publication_date = _format_pub_date(date_text)
+
+    non_academic_authors_list = []
+    # Insertion-ordered dict used as an ordered set: O(1) de-duplication of company names
+    company_affiliations = {}
+    corresponding_author_email = None
+
+    has_non_academic_author = False
+
+    for author, affiliations_text in authors:
+         author_findtext = author.findtext
+         author_name = f"{author_findtext('ForeName', '')} {author_findtext('LastName', '')}".strip()
+
+         author_email = None # Check within affiliation info
+
+         for affil_text in affiliations_text:
+             # Simple email check within affiliation text
+             match = email_search(affil_text)
+             if match:
+                 author_email = match.group(0)
+         author_affiliation = "; ".join(affiliations_text)
+
+         # Check if this author is non-academic. Identical affiliations are classified once and share
+         # one interned string; the email comes from the affiliation text, so the text alone is the key.
+         author_affiliation = sys.intern(author_affiliation)
+         classification = classify_cache.get(author_affiliation)
+         if classification is None:
+             classification = is_non_academic(author_affiliation, author_email)
+             classify_cache[author_affiliation] = classification
+         is_na, company_name = classification
+
+         if is_na:
+             has_non_academic_author = True
+             non_academic_authors_list.append(author_name)
+             if company_name:
+                 company_affiliations[company_name] = None
+
+         # Check for corresponding author email (often in affiliation)
+         # This is a basic check; PubMed XML structure can be complex.
+         # A more robust approach might involve specific XML tags if available.
+         if author_email and not corresponding_author_email: # Take the first found email as corresponding
+              corresponding_author_email = author_email
+
+    # Only include papers with at least one non-academic author
+    if not has_non_academic_author:
+        return None
+    return (
+        pmid,
+        title,
+        publication_date,
+        "; ".join(non_academic_authors_list),
+        "; ".join(company_affiliations),
+        corresponding_author_email or "N/A",
+    )
+
+def _write_csv(stream: TextIO, rows: Iterable[Tuple[str, ...]]) -> None:
+    """Writes the header and rows as CSV to an open text stream."""
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(OUTPUT_FIELDS)
+    writer.writerows(rows)
+
+def output_results(results: Iterable[Tuple[str, ...]], output_file: Optional[str]):
+    """Outputs the results to a CSV file or the console, consuming them as they are produced."""
+    results = iter(results)
+    first = next(results, None)
+    if first is None:
         logger.info("No results to output.")
         return
-
-    df = pd.DataFrame(results)
+    results = chain([first], results)
 
     if output_file:
         try:
-            df.to_csv(output_file, index=False, encoding='utf-8')
+            with open(output_file, "w", newline="", encoding="utf-8") as f:
+                _write_csv(f, results)
             logger.info(f"Results successfully saved to {output_file}")
         except Exception as e:
             logger.error(f"Error writing results to CSV file {output_file}: {e}")
     else:
-        # Print to console (might be long)
+        # Print to console (might be long); logs go to stderr, so stdout stays valid CSV
         logger.info("Outputting results to console:")
-        print(df.to_string(index=False))
+        _write_csv(sys.stdout, results)
 
 
 def main():
@@ -257,17 +598,16 @@ def main():
          sys.exit(1)
 
 
-    pmids = search_pubmed(args.query)
-    if not pmids:
+    count, xml_batches = asyncio.run(collect_papers(args.query, use_cache=not args.no_cache))
+    if not count:
         logger.info("No papers found matching the query.")
         sys.exit(0)
 
-    papers_data = fetch_paper_details(pmids)
-    if not papers_data:
+    if not xml_batches:
         logger.info("Could not fetch details for the found papers.")
         sys.exit(0)
 
-    processed_results = process_papers(papers_data)
+    processed_results = process_papers(xml_batches)
 
     output_results(processed_results, args.file)
 